@@ -0,0 +1,300 @@
+import json
+import sqlite3
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Union, Iterable
+
+from jira import JIRA, JIRAError
+
+from jira_work_logger.constants import CACHE_FILE, CACHE_MAX_ENTRIES
+from jira_work_logger.request_memo import RequestMemo, normalize_jql
+from jira_work_logger.resource_cache import ResourceCache
+
+
+class BackendError(Exception):
+    pass
+
+
+class Worklog:
+    def __init__(self, issue: str, started: datetime, seconds: int, comment: str = '', worklog_id: str = None):
+        self.issue = issue
+        self.started = started
+        self.seconds = seconds
+        self.comment = comment or ''
+        self.worklog_id = worklog_id
+
+    @property
+    def date(self):
+        return str(self.started.date())
+
+
+class WorklogBackend(ABC):
+    """Base class of worklog storages used by LogWorker.
+    Backend reads already logged baseline, discovers tasks suitable for logging and writes worklogs.
+    Storages capable of bulk submission should override add_worklogs() to write all worklogs in one go"""
+    required_params = ()
+
+    def __init__(self, params):
+        self.settings = params
+        self.requests_sent = 0
+
+    def connect(self):
+        pass
+
+    def close(self):
+        pass
+
+    @abstractmethod
+    def find_tasks(self, status: Union[str, Iterable], date: Union[str, Iterable]) -> list:
+        """Get keys of tasks that were in given status(es) on given date or during given dates range"""
+
+    def count_tasks(self, status: Union[str, Iterable], date: Union[str, Iterable]) -> int:
+        """Get number of tasks find_tasks() would return. Backends should override it with a cheaper query"""
+        return len(self.find_tasks(status, date))
+
+    @abstractmethod
+    def load_worklogs(self, from_date: str, to_date: str) -> Iterable[Worklog]:
+        """Get worklogs of current user started within given dates range"""
+
+    @abstractmethod
+    def add_worklog(self, worklog: Worklog):
+        """Write new worklog"""
+
+    def add_worklogs(self, worklogs: Iterable[Worklog]):
+        for worklog in worklogs:
+            self.add_worklog(worklog)
+
+    @abstractmethod
+    def update_worklog(self, worklog: Worklog):
+        """Set time spent of already existing worklog identified by its worklog_id"""
+
+    def update_worklogs(self, worklogs: Iterable[Worklog]):
+        for worklog in worklogs:
+            self.update_worklog(worklog)
+
+
+class JiraBackend(WorklogBackend):
+    required_params = ('jira_host', 'jira_user', 'jira_pass')
+
+    def __init__(self, params):
+        super().__init__(params)
+        self.conn = None
+        self.cache = None
+        self.memo = RequestMemo()
+
+    def connect(self):
+        try:
+            self.conn = JIRA(server=self.settings['jira_host'], validate=True, max_retries=0,
+                             basic_auth=(self.settings['jira_user'], self.settings['jira_pass']))
+            self.cache = ResourceCache(CACHE_FILE, f'{self.settings["jira_user"]}@{self.settings["jira_host"]}',
+                                       CACHE_MAX_ENTRIES)
+        except JIRAError as exn:
+            raise BackendError(f'JiraError HTTP {exn.status_code}')
+        except Exception as exn:
+            raise BackendError(str(exn))
+
+    def close(self):
+        if self.cache:
+            self.cache.save()
+
+    def find_tasks(self, status: Union[str, Iterable], date: Union[str, Iterable]) -> list:
+        tasks = self.search(self.compose_tasks_query(status, date), 'key')
+        return [task.key for task in tasks.iterable]
+
+    def count_tasks(self, status: Union[str, Iterable], date: Union[str, Iterable]) -> int:
+        self.requests_sent += 1
+        tasks = self.conn.search_issues(jql_str=self.compose_tasks_query(status, date), fields='key', maxResults=1)
+        return tasks.total
+
+    def compose_tasks_query(self, status: Union[str, Iterable], date: Union[str, Iterable]) -> str:
+        status_filter = f' AND Status was "{status}"' if isinstance(status, str) else f' AND Status was IN {status}'
+        date_filter = f' ON "{date}"' if isinstance(date, str) else f' DURING ("{date[0]}","{date[1]}")'
+        user_filter = self.compose_user_filter()
+        ignored_list = ', '.join(self.settings['ignore_tasks']) if self.settings['ignore_tasks'] else []
+        ignored_filter = f' AND NOT issue in ({ignored_list})' if ignored_list else ''
+        return f'{user_filter}{status_filter}{date_filter}{ignored_filter}'
+
+    def search(self, query: str, fields: str, tags: Iterable[str] = ()):
+        """Search issues memoizing results by normalized query for the rest of the run"""
+        def load():
+            self.requests_sent += 1
+            return self.conn.search_issues(jql_str=query, fields=fields, maxResults=1000)
+
+        return self.memo.get(f'search[{fields}]:{normalize_jql(query)}', load, tags)
+
+    def compose_user_filter(self):
+        assignee = 'assignee=currentUser()' if self.settings['tasks_filter']['user_assignee'] else ''
+        validator = 'validator=currentUser()' if self.settings['tasks_filter']['user_validator'] else ''
+        creator = 'creator=currentUser()' if self.settings['tasks_filter']['user_creator'] else ''
+
+        user_filter = f'{assignee}' if assignee else f''
+        if validator:
+            user_filter = f'{validator}' if not assignee else f'({assignee} OR {validator})'
+        if creator:
+            user_filter = f'{creator}' if (not assignee and not validator) else f'({user_filter} OR {creator})'
+
+        return user_filter
+
+    def load_worklogs(self, from_date: str, to_date: str) -> Iterable[Worklog]:
+        """Yield worklogs issue by issue, so callers could process them while the rest is still being loaded"""
+        date_filter = f'worklogDate = "{from_date}"' if from_date == to_date else \
+            f'worklogDate >= "{from_date}" AND worklogDate <= "{to_date}"'
+        query = f'worklogAuthor = currentUser() AND {date_filter}'
+        start_date = datetime.strptime(from_date, '%Y-%m-%d').date()
+        end_date = datetime.strptime(to_date, '%Y-%m-%d').date()
+        date_tags = [f'date:{start_date + timedelta(n)}' for n in range((end_date - start_date).days + 1)]
+        logged_tasks = self.search(query, 'updated', date_tags)
+
+        for task in logged_tasks.iterable:
+            worklogs = self.memo.get(f'issue/{task.key}/worklog',
+                                     lambda: self.get_worklogs_json(task.key, task.fields.updated),
+                                     [f'issue:{task.key}'])
+
+            for wlog in worklogs:
+                if from_date <= wlog['started'].split('T')[0] <= to_date:
+                    yield Worklog(task.key, datetime.strptime(wlog['started'], '%Y-%m-%dT%H:%M:%S.%f%z'),
+                                  wlog['timeSpentSeconds'], wlog.get('comment', ''), wlog['id'])
+
+    def get_worklogs_json(self, issue: str, updated: str) -> list:
+        """Get current user's worklogs of the issue revalidating locally cached copy.
+        Only fields used by logger are kept, worklogs of other users are never stored.
+        Unchanged issue 'updated' timestamp means cached worklogs are still actual and no request is needed,
+        otherwise conditional request is sent, so server could answer with 304 if worklogs didn't change"""
+        resource = f'issue/{issue}/worklog'
+        cached = self.cache.get(resource)
+        validators = cached['validators'] if cached else {}
+
+        if cached and validators.get('updated') == updated:
+            return cached['data']
+
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+        response = self.rest_get(resource, headers)
+        if cached and response.status_code == 304:
+            data = cached['data']
+        else:
+            data = [{'id': wlog['id'], 'started': wlog['started'], 'timeSpentSeconds': wlog['timeSpentSeconds'],
+                     'comment': wlog.get('comment', '')} for wlog in response.json()['worklogs']
+                    if wlog['author'].get('name') == self.settings['jira_user']]
+        self.cache.put(resource, data, {
+            'updated': updated,
+            'etag': response.headers.get('ETag', validators.get('etag')),
+            'last_modified': response.headers.get('Last-Modified', validators.get('last_modified'))
+        })
+        return data
+
+    def rest_get(self, resource: str, headers: dict):
+        """Get JIRA REST resource through authenticated session of the client.
+        Public client API neither passes conditional headers nor exposes response status and headers needed for
+        revalidation. Session verb methods raise JIRAError for unsuccessful responses in all client versions"""
+        self.requests_sent += 1
+        return self.conn._session.get(self.conn._get_url(resource), headers=headers)
+
+    def rest_put(self, resource: str, data: dict):
+        """Put data to JIRA REST resource. Updating a worklog with public client API costs an additional GET of it"""
+        self.requests_sent += 1
+        return self.conn._session.put(self.conn._get_url(resource), data=json.dumps(data))
+
+    def add_worklog(self, worklog: Worklog):
+        self.requests_sent += 1
+        self.conn.add_worklog(worklog.issue, timeSpentSeconds=worklog.seconds, started=worklog.started,
+                              comment=worklog.comment)
+        self.memo.invalidate(f'issue:{worklog.issue}', f'date:{worklog.date}')
+
+    def update_worklog(self, worklog: Worklog):
+        self.rest_put(f'issue/{worklog.issue}/worklog/{worklog.worklog_id}',
+                      {'timeSpentSeconds': int(worklog.seconds)})
+        self.memo.invalidate(f'issue:{worklog.issue}', f'date:{worklog.date}')
+
+
+class SqliteBackend(WorklogBackend):
+    """Local worklog storage which doesn't need any server. Suitable for testing and benchmarking.
+    Tasks statuses history has to be seeded into 'tasks' table with seed_tasks() before use"""
+    time_format = '%Y-%m-%dT%H:%M:%S%z'
+
+    def __init__(self, params):
+        super().__init__(params)
+        self.conn = None
+
+    def connect(self):
+        try:
+            db_path = Path(self.settings['backend_path']).expanduser()
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(str(db_path))
+            self.conn.execute('CREATE TABLE IF NOT EXISTS tasks (key TEXT, status TEXT, date TEXT)')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS worklogs (id INTEGER PRIMARY KEY, issue TEXT, '
+                              'started TEXT, seconds INTEGER, comment TEXT)')
+            self.conn.commit()
+        except (sqlite3.Error, OSError) as exn:
+            raise BackendError(f'SQLite error: {str(exn)}')
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+
+    def seed_tasks(self, tasks: Iterable[tuple]):
+        """Store tasks statuses history given as (key, status, from_date, to_date) tuples"""
+        rows = []
+        for key, status, from_date, to_date in tasks:
+            start_date = datetime.strptime(from_date, '%Y-%m-%d').date()
+            end_date = datetime.strptime(to_date, '%Y-%m-%d').date()
+            rows.extend((key, status, str(start_date + timedelta(n))) for n in range((end_date - start_date).days + 1))
+
+        self.conn.executemany('INSERT INTO tasks (key, status, date) VALUES (?, ?, ?)', rows)
+        self.conn.commit()
+
+    def find_tasks(self, status: Union[str, Iterable], date: Union[str, Iterable]) -> list:
+        statuses = [status] if isinstance(status, str) else list(status)
+        from_date, to_date = (date, date) if isinstance(date, str) else date
+        ignored = self.settings['ignore_tasks'] or []
+        self.requests_sent += 1
+        query = (f'SELECT DISTINCT key FROM tasks WHERE status IN ({", ".join("?" * len(statuses))}) '
+                 f'AND date BETWEEN ? AND ? AND key NOT IN ({", ".join("?" * len(ignored))}) ORDER BY key')
+        rows = self.conn.execute(query, (*statuses, from_date, to_date, *ignored)).fetchall()
+        return [row[0] for row in rows]
+
+    def load_worklogs(self, from_date: str, to_date: str) -> Iterable[Worklog]:
+        query = ('SELECT id, issue, started, seconds, comment FROM worklogs '
+                 'WHERE substr(started, 1, 10) BETWEEN ? AND ?')
+        self.requests_sent += 1
+        rows = self.conn.execute(query, (from_date, to_date)).fetchall()
+        return [Worklog(issue, datetime.strptime(started, self.time_format), seconds, comment, str(worklog_id))
+                for worklog_id, issue, started, seconds, comment in rows]
+
+    def add_worklog(self, worklog: Worklog):
+        self.add_worklogs([worklog])
+
+    def add_worklogs(self, worklogs: Iterable[Worklog]):
+        rows = [(wlog.issue, wlog.started.strftime(self.time_format), int(wlog.seconds), wlog.comment)
+                for wlog in worklogs]
+        self.requests_sent += 1
+        self.conn.executemany('INSERT INTO worklogs (issue, started, seconds, comment) VALUES (?, ?, ?, ?)', rows)
+        self.conn.commit()
+
+    def update_worklog(self, worklog: Worklog):
+        self.update_worklogs([worklog])
+
+    def update_worklogs(self, worklogs: Iterable[Worklog]):
+        rows = [(int(wlog.seconds), int(wlog.worklog_id)) for wlog in worklogs]
+        self.requests_sent += 1
+        self.conn.executemany('UPDATE worklogs SET seconds = ? WHERE id = ?', rows)
+        self.conn.commit()
+
+
+BACKENDS = {
+    'jira': JiraBackend,
+    'sqlite': SqliteBackend
+}
+
+
+def create_backend(params) -> WorklogBackend:
+    """Create worklog backend selected in params"""
+    try:
+        return BACKENDS[params['backend']](params)
+    except KeyError:
+        raise BackendError(f'Unknown worklog backend "{params["backend"]}"')
@@ -1,4 +1,5 @@
 from enum import IntEnum
+from pathlib import Path
 
 APP_VERSION = '1.1'
 WEEKDAYS = {
@@ -11,6 +12,8 @@ WEEKDAYS = {
     'SU': False
 }
 PARAMS = {
+    'backend': 'jira',
+    'backend_path': str(Path.home() / '.jira-work-logger' / 'worklogs.db'),
     'jira_host': '',
     'jira_user': '',
     'jira_pass': '',
@@ -18,17 +21,34 @@ PARAMS = {
     'work_days': {},
     'target_hrs': '',
     'daily_only': False,
+    'run_in_process': False,
+    'mark_worklogs': False,
     'daily_tasks': {},
     'tasks_comment': '',
     'ignore_tasks': [],
     'from_date': '',
-    'to_date': ''
+    'to_date': '',
+    'selected_dates': [],
+    'only_selected_dates': False,
+    'warn_api_calls': 500,
+    'max_api_calls': 0,
+    'warn_run_minutes': 5,
+    'max_run_minutes': 0,
+    'ignore_estimate_limits': False
 }
-MANDATORY_PARAMS = ['jira_host', 'jira_user', 'jira_pass', 'from_date', 'to_date']
+MANDATORY_PARAMS = ['from_date', 'to_date']
 
 TASK_INPROGRESS_STATUS = 'DOING'
 TASK_REVIEW_STATUS = 'VERIFYING'
+WORKLOG_MARKER = '[jira-work-logger]'
 CONFIG_FILE = 'config.yaml'
+CACHE_FILE = str(Path.home() / '.jira-work-logger' / 'cache.json')
+CACHE_MAX_ENTRIES = 2000
+RUN_STATS_FILE = str(Path.home() / '.jira-work-logger' / 'run_stats.json')
+RUN_STATS_DEPTH = 10
+DEFAULT_SECONDS_PER_CALL = 0.5
+ESTIMATE_SAMPLE_DATES = 3
+PROCESS_POLL_INTERVAL = 100  # ms
 
 
 class IsoWeekdays(IntEnum):
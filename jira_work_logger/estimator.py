@@ -0,0 +1,106 @@
+import json
+from pathlib import Path
+
+from jira_work_logger.backends import WorklogBackend
+from jira_work_logger.constants import *
+
+
+class RunEstimate:
+    def __init__(self, work_days: int, candidate_tasks: int, api_calls: int, seconds: float, model_calls: int = 0):
+        self.work_days = work_days
+        self.candidate_tasks = candidate_tasks
+        self.api_calls = api_calls
+        self.seconds = seconds
+        # Calls count given by the model itself before calibration, it's stored to calibrate later estimates
+        self.model_calls = model_calls
+
+    def __str__(self):
+        return (f'Estimate: {self.work_days} working day(s), ~{self.candidate_tasks} candidate task(s) per day, '
+                f'~{self.api_calls} API call(s), ~{round(self.seconds / 60, 1)} minute(s)')
+
+    def check_thresholds(self, params):
+        """Get warnings and errors for estimated values exceeding thresholds from params.
+        Limits ignored by user only produce warnings, as the estimate is just a guess"""
+        warnings, exceeded = [], []
+        minutes = round(self.seconds / 60, 1)
+
+        if params['max_api_calls'] and self.api_calls > params['max_api_calls']:
+            exceeded.append(f'Run would take ~{self.api_calls} API calls, limit is {params["max_api_calls"]}')
+        elif params['warn_api_calls'] and self.api_calls > params['warn_api_calls']:
+            warnings.append(f'Run would take ~{self.api_calls} API calls, JIRA rate limit could be hit')
+
+        if params['max_run_minutes'] and minutes > params['max_run_minutes']:
+            exceeded.append(f'Run would take ~{minutes} minutes, limit is {params["max_run_minutes"]}')
+        elif params['warn_run_minutes'] and minutes > params['warn_run_minutes']:
+            warnings.append(f'Run would take ~{minutes} minutes')
+
+        if params['ignore_estimate_limits']:
+            return warnings + [f'{message}, but limits are ignored' for message in exceeded], []
+
+        return warnings, [f'{message}! Narrow dates range down' for message in exceeded]
+
+
+def estimate_run(params, backend: WorklogBackend, work_dates: list) -> RunEstimate:
+    """Estimate API calls and wall time of logging run for given work dates.
+    Candidate tasks are counted for a few sample dates, as a date can only touch tasks active on it"""
+    if not work_dates:
+        return RunEstimate(0, 0, 0, 0)
+
+    candidate_tasks = 0 if params['daily_only'] else count_candidate_tasks(backend, work_dates)
+    writes_per_date = len(params['daily_tasks'] or {}) + candidate_tasks
+
+    # Every date takes baseline search, two searches for tasks in progress and in review, the writes themselves
+    # and summary search along with re-reading worklogs of written tasks. Worklogs of untouched tasks are
+    # served from cache and memo, so they aren't counted
+    model_calls = len(work_dates) * (4 + 2 * writes_per_date)
+    calls_ratio, seconds_per_call = get_calibration(params['backend'])
+    api_calls = round(model_calls * calls_ratio)
+
+    return RunEstimate(len(work_dates), candidate_tasks, api_calls, api_calls * seconds_per_call, model_calls)
+
+
+def count_candidate_tasks(backend: WorklogBackend, work_dates: list) -> int:
+    """Get average number of tasks in progress or in review on evenly spread sample dates"""
+    sample_size = min(len(work_dates), ESTIMATE_SAMPLE_DATES)
+    step = len(work_dates) / sample_size
+    sample_dates = [work_dates[int(n * step)] for n in range(sample_size)]
+    statuses = (TASK_INPROGRESS_STATUS, TASK_REVIEW_STATUS)
+    counts = [backend.count_tasks(statuses, _date) for _date in sample_dates]
+    return round(sum(counts) / len(counts))
+
+
+def load_run_stats() -> dict:
+    try:
+        return json.loads(Path(RUN_STATS_FILE).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def record_run_stats(backend_name: str, api_calls: int, seconds: float, estimated_calls: int):
+    """Store calls and timings of finished run, so later estimates are calibrated for actual backend behaviour
+    and server responsiveness"""
+    if not api_calls:
+        return
+
+    stats = load_run_stats()
+    runs = stats.get(backend_name, []) + [{'api_calls': api_calls, 'seconds': seconds,
+                                           'estimated_calls': estimated_calls}]
+    stats[backend_name] = runs[-RUN_STATS_DEPTH:]
+
+    try:
+        Path(RUN_STATS_FILE).parent.mkdir(parents=True, exist_ok=True)
+        Path(RUN_STATS_FILE).write_text(json.dumps(stats))
+    except OSError:
+        pass
+
+
+def get_calibration(backend_name: str):
+    """Get ratio of actual to estimated API calls and seconds per call averaged over previous runs"""
+    runs = load_run_stats().get(backend_name, [])
+    api_calls = sum(run['api_calls'] for run in runs)
+    estimated_calls = sum(run['estimated_calls'] for run in runs if run.get('estimated_calls'))
+    calibrated_calls = sum(run['api_calls'] for run in runs if run.get('estimated_calls'))
+
+    calls_ratio = calibrated_calls / estimated_calls if estimated_calls else 1
+    seconds_per_call = sum(run['seconds'] for run in runs) / api_calls if api_calls else DEFAULT_SECONDS_PER_CALL
+    return calls_ratio, seconds_per_call
@@ -2,14 +2,17 @@ from datetime import datetime
 from pathlib import Path
 
 import yaml
-from PyQt5.QtCore import Qt, QThread, QRegExp, QDate
-from PyQt5.QtGui import QIcon, QColor, QRegExpValidator
+from PyQt5.QtCore import Qt, QThread, QRegExp, QDate, QTimer
+from PyQt5.QtGui import QIcon, QColor, QRegExpValidator, QTextCharFormat, QFont
 from PyQt5.QtWidgets import (QMainWindow, QAction, qApp, QWidget, QVBoxLayout, QHBoxLayout, QGroupBox, QDoubleSpinBox,
                              QPushButton, QFormLayout, QLineEdit, QLabel, QCalendarWidget, QCheckBox, QGridLayout,
                              QTextEdit, QTabWidget, QFrame)
 
+from jira_work_logger.backends import BACKENDS
 from jira_work_logger.constants import *
-from jira_work_logger.log_worker import LogWorker
+from jira_work_logger.heatmap_loader import HeatmapLoader
+from jira_work_logger.log_worker import LogWorker, get_work_dates
+from jira_work_logger.process_worker import ProcessWorker
 
 
 class MainWindow(QMainWindow):
@@ -24,6 +27,9 @@ class MainWindow(QMainWindow):
         self.console = LoggerConsole(self.root)
         self.worker = None
         self.worker_thread = None
+        self.run_range = None
+        self.estimate_worker = None
+        self.estimate_thread = None
         self.init_ui()
         self.update_start_button()
 
@@ -53,33 +59,130 @@ class MainWindow(QMainWindow):
         self.worker.msg.connect(self.console.print_msg)
         self.worker.warn.connect(self.console.print_warn)
         self.worker.err.connect(self.console.print_err)
+        self.worker.progress.connect(self.show_progress)
+        self.worker.finished.connect(self.worker_thread.quit)
         self.worker_thread.started.connect(self.worker.execute_logging)
         self.worker_thread.finished.connect(self.stop_worker_thread)
 
+    def setup_worker_process(self):
+        self.worker = ProcessWorker(self.params)
+
+        # Assign signals to slots
+        self.worker.msg.connect(self.console.print_msg)
+        self.worker.warn.connect(self.console.print_warn)
+        self.worker.err.connect(self.console.print_err)
+        self.worker.progress.connect(self.show_progress)
+        self.worker.finished.connect(self.stop_worker_process)
+
     def execute_autologging(self):
-        get_main_window().findChild(QWidget, 'main_buttons', Qt.FindChildrenRecursively).start_btn.setDisabled(True)
+        buttons = get_main_window().findChild(QWidget, 'main_buttons', Qt.FindChildrenRecursively)
+        buttons.start_btn.setDisabled(True)
+        buttons.estimate_btn.setDisabled(True)
+        buttons.stop_btn.setEnabled(True)
         self.read_params()
-        self.setup_worker_thread()
+        self.run_range = (self.params['from_date'], self.params['to_date'])
+
+        if self.params['run_in_process']:
+            self.setup_worker_process()
+        else:
+            self.setup_worker_thread()
+
         self.root.setCurrentIndex(1)
         qApp.processEvents()
-        self.worker_thread.start()
+
+        if self.worker_thread:
+            self.worker_thread.start()
+        else:
+            self.worker.start()
+
+    def cancel_autologging(self):
+        get_main_window().findChild(QWidget, 'main_buttons', Qt.FindChildrenRecursively).stop_btn.setDisabled(True)
+
+        if self.worker_thread:
+            self.worker_thread.requestInterruption()
+            self.console.print_warn('Stop requested, worker thread will stop once current date is processed')
+        elif self.worker:
+            self.worker.cancel()
 
     def stop_worker_thread(self):
         self.console.print_msg('Worker thread has been stopped')
         self.worker_thread.deleteLater()
-        get_main_window().findChild(QWidget, 'main_buttons', Qt.FindChildrenRecursively).start_btn.setEnabled(True)
+        self.worker_thread = None
+        self.worker = None
+        self.refresh_heatmap()
+        self.reset_main_buttons()
+
+    def stop_worker_process(self):
+        self.console.print_msg('Worker process has been stopped')
+        self.worker.deleteLater()
+        self.worker = None
+        self.refresh_heatmap()
+        self.reset_main_buttons()
+
+    def reset_main_buttons(self):
+        buttons = get_main_window().findChild(QWidget, 'main_buttons', Qt.FindChildrenRecursively)
+        buttons.stop_btn.setDisabled(True)
+        self.update_start_button()
         qApp.processEvents()
 
+    def refresh_heatmap(self):
+        """Reload logged hours changed by finished run"""
+        self.findChild(QWidget, 'logged_heatmap', Qt.FindChildrenRecursively).invalidate_range(*self.run_range)
+        self.run_range = None
+
+    def show_progress(self, processed: int, total: int):
+        self.statusBar().showMessage(f'{processed} of {total} working day(s) processed')
+
+    def execute_estimate(self):
+        buttons = self.findChild(QWidget, 'main_buttons', Qt.FindChildrenRecursively)
+        buttons.estimate_btn.setDisabled(True)
+        buttons.clear_estimate()
+        self.read_params()
+
+        self.estimate_worker = LogWorker(self.params)
+        self.estimate_thread = QThread()
+        self.estimate_worker.moveToThread(self.estimate_thread)
+
+        self.estimate_worker.estimated.connect(buttons.show_estimate)
+        self.estimate_worker.warn.connect(buttons.show_estimate_warn)
+        self.estimate_worker.err.connect(buttons.show_estimate_err)
+        self.estimate_worker.finished.connect(self.estimate_thread.quit)
+        self.estimate_thread.started.connect(self.estimate_worker.execute_estimate)
+        self.estimate_thread.finished.connect(self.stop_estimate_thread)
+        self.estimate_thread.start()
+
+    def stop_estimate_thread(self):
+        self.estimate_thread.deleteLater()
+        self.estimate_thread = None
+        self.estimate_worker = None
+        self.update_start_button()
+
     def update_start_button(self):
         self.read_params()
         start_btn = self.findChild(QWidget, 'main_buttons', Qt.FindChildrenRecursively).start_btn
+        estimate_btn = self.findChild(QWidget, 'main_buttons', Qt.FindChildrenRecursively).estimate_btn
 
-        if not [param for param in MANDATORY_PARAMS if not self.params[param]]:
+        # Neither another run nor estimate may be started until current run is finished
+        if self.worker:
+            start_btn.setDisabled(True)
+            estimate_btn.setDisabled(True)
+            return
+
+        # Selection of deficient days which turned out empty leaves nothing to process
+        nothing_selected = self.params['only_selected_dates'] and not self.params['selected_dates']
+
+        if not [param for param in self.mandatory_params() if not self.params[param]] and not nothing_selected:
             if True in list(self.params['tasks_filter'].values()):
                 start_btn.setEnabled(True)
+                estimate_btn.setEnabled(not self.estimate_thread)
                 return
 
         start_btn.setDisabled(True)
+        estimate_btn.setDisabled(True)
+
+    def mandatory_params(self):
+        backend = BACKENDS.get(self.params['backend'])
+        return MANDATORY_PARAMS + list(backend.required_params if backend else ())
 
     def read_params(self):
         """Reading params from widgets across Configurator"""
@@ -102,12 +205,16 @@ class MainWindow(QMainWindow):
         self.params['daily_tasks'] = tasks_string_to_dict(days_widget.daily_tasks.text())
         self.params['tasks_comment'] = days_widget.tasks_comment.text()
         self.params['daily_only'] = days_widget.daily_only.isChecked()
+        self.params['run_in_process'] = days_widget.run_in_process.isChecked()
+        self.params['ignore_estimate_limits'] = days_widget.ignore_estimate_limits.isChecked()
         self.params['ignore_tasks'] = tasks_string_to_list(days_widget.ignore_tasks.text())
 
         # Date settings
         date_widget = self.findChild(QWidget, 'dates_selector', Qt.FindChildrenRecursively)
         self.params['from_date'] = date_widget.from_cal.selectedDate().toString(Qt.ISODate)
         self.params['to_date'] = date_widget.to_cal.selectedDate().toString(Qt.ISODate)
+        self.params['selected_dates'] = list(date_widget.selected_dates)
+        self.params['only_selected_dates'] = date_widget.only_selected_dates
 
     def load_config(self):
         config_path = Path(CONFIG_FILE)
@@ -242,6 +349,8 @@ class DateSelector(QGroupBox):
         super().__init__(parent)
         self.parent = parent
         self.setObjectName('dates_selector')
+        self.selected_dates = []
+        self.only_selected_dates = False
         self.setTitle('Dates range')
         self.setAlignment(Qt.AlignHCenter)
 
@@ -289,9 +398,16 @@ class DateSelector(QGroupBox):
         self.layout.addWidget(from_frame, 0, Qt.AlignCenter)
         self.layout.addWidget(to_frame, 0, Qt.AlignCenter)
 
+        # Setup logged hours heatmap
+        self.heatmap = LoggedHoursHeatmap(self)
+        self.layout.addWidget(self.heatmap, 0, Qt.AlignCenter)
+
         self.update_calendars()
 
     def update_calendars(self):
+        # Any manual range change drops previously selected deficient days
+        self.clear_selection()
+
         if self.from_cal.selectedDate():
             self.to_cal.setEnabled(True)
             self.from_cal.setMaximumDate(QDate().currentDate())
@@ -302,6 +418,219 @@ class DateSelector(QGroupBox):
         if self.to_cal.selectedDate():
             self.to_lbl.setText(self.to_cal.selectedDate().toString(Qt.ISODate))
 
+    def clear_selection(self):
+        """Drop selected deficient days, as they're valid only for range and settings they were selected with"""
+        if self.only_selected_dates:
+            self.selected_dates = []
+            self.only_selected_dates = False
+            self.heatmap.status_lbl.setText('Logged hours')
+
+        self.heatmap.repaint_dates()
+
+
+class LoggedHoursHeatmap(QFrame):
+    def __init__(self, parent):
+        super().__init__(parent, Qt.Widget)
+        self.parent = parent
+        self.setObjectName('logged_heatmap')
+        self.logged_seconds = {}
+        self.loaded_months = set()
+        self.loading_months = set()
+        self.loading_failed = False
+        self.select_after_load = False
+        self.loader = None
+        self.loader_thread = None
+
+        layout = QVBoxLayout(self)
+
+        self.status_lbl = QLabel(self)
+        self.status_lbl.setText('Logged hours')
+        self.status_lbl.setStyleSheet('font: bold')
+
+        self.cal = QCalendarWidget(self)
+        self.cal.setGridVisible(True)
+        self.cal.setFirstDayOfWeek(Qt.DayOfWeek(1))
+        self.cal.setMaximumDate(QDate().currentDate())
+        self.cal.setSelectionMode(QCalendarWidget.NoSelection)
+        self.cal.setToolTip('Hours already logged per day:\n'
+                            'red - nothing logged, yellow - below target, green - target reached')
+        self.cal.currentPageChanged.connect(self.load_month)
+
+        buttons_frame = QFrame(self, Qt.Widget)
+        buttons_layout = QHBoxLayout(buttons_frame)
+        buttons_layout.setSpacing(3)
+        buttons_layout.setContentsMargins(0, 0, 0, 0)
+
+        self.refresh_btn = QPushButton('Refresh')
+        self.refresh_btn.setToolTip('Load logged hours for the displayed month from JIRA server')
+        self.refresh_btn.clicked.connect(self.refresh)
+
+        self.deficient_btn = QPushButton('Select deficient days')
+        self.deficient_btn.setToolTip('Process only working days of selected range\n'
+                                      'which have less than target hours logged')
+        self.deficient_btn.clicked.connect(self.select_deficient_days)
+
+        buttons_layout.addWidget(self.refresh_btn)
+        buttons_layout.addWidget(self.deficient_btn)
+
+        layout.addWidget(self.status_lbl, 0, Qt.AlignHCenter)
+        layout.addWidget(self.cal, 0, Qt.AlignHCenter)
+        layout.addWidget(buttons_frame, 0, Qt.AlignHCenter)
+
+        # Initial loading is deferred until main window is completely built
+        QTimer.singleShot(0, self.load_shown_month)
+
+    def refresh(self):
+        """Drop cached totals and reload currently displayed month"""
+        if self.loader_thread:
+            return
+
+        self.logged_seconds = {}
+        self.loaded_months = set()
+        self.cal.setDateTextFormat(QDate(), QTextCharFormat())
+        self.load_shown_month()
+
+    def load_shown_month(self):
+        self.load_month(self.cal.yearShown(), self.cal.monthShown())
+
+    def load_month(self, year: int, month: int):
+        first_day = QDate(year, month, 1)
+        last_day = QDate(year, month, first_day.daysInMonth())
+        self.load_range(first_day.toString(Qt.ISODate), last_day.toString(Qt.ISODate))
+
+    def load_range(self, from_date: str, to_date: str):
+        """Start background loading of logged hours for months of given range which are not cached yet"""
+        if self.loader_thread:
+            return False
+
+        missing_months = sorted(get_months(from_date, to_date) - self.loaded_months)
+
+        if not missing_months:
+            return False
+
+        main_window = get_main_window()
+        main_window.read_params()
+
+        backend = BACKENDS.get(main_window.params['backend'])
+        if backend and not [param for param in backend.required_params if not main_window.params[param]]:
+            self.loading_months = set(missing_months)
+            self.loading_failed = False
+            self.status_lbl.setText(f'Loading {", ".join(missing_months)}...')
+
+            last_month = QDate.fromString(f'{missing_months[-1]}-01', Qt.ISODate)
+            self.loader = HeatmapLoader(main_window.params, f'{missing_months[0]}-01',
+                                        f'{missing_months[-1]}-{last_month.daysInMonth()}')
+            self.loader_thread = QThread()
+            self.loader.moveToThread(self.loader_thread)
+
+            self.loader.day_loaded.connect(self.update_date)
+            self.loader.err.connect(self.load_failed)
+            self.loader.finished.connect(self.loader_thread.quit)
+            self.loader_thread.started.connect(self.loader.load_logged_seconds)
+            self.loader_thread.finished.connect(self.load_finished)
+            self.loader_thread.start()
+            return True
+
+        self.status_lbl.setText('Specify worklog backend settings to load logged hours')
+        return False
+
+    def invalidate_range(self, from_date: str, to_date: str):
+        """Drop cached totals of months overlapping given range and reload displayed month.
+        Deficient days selection is dropped as well, since it was made upon outdated totals"""
+        months = get_months(from_date, to_date)
+        self.loaded_months -= months
+        self.loading_months -= months
+        self.logged_seconds = {date: sec for date, sec in self.logged_seconds.items() if date[:7] not in months}
+        self.parent.clear_selection()
+        self.load_shown_month()
+
+    def update_date(self, date: str, seconds: int):
+        self.logged_seconds[date] = seconds
+        self.paint_date(date)
+
+    def load_failed(self, err: str):
+        self.loading_failed = True
+        self.status_lbl.setText('Logged hours could not be loaded')
+        self.status_lbl.setToolTip(err)
+
+    def load_finished(self):
+        if not self.loading_failed:
+            self.loaded_months.update(self.loading_months)
+            self.status_lbl.setText('Logged hours')
+            self.status_lbl.setToolTip('')
+            self.repaint_dates()
+
+        self.loading_months = set()
+        self.loader_thread.deleteLater()
+        self.loader_thread = None
+        self.loader = None
+
+        if self.select_after_load:
+            self.select_after_load = False
+
+            if not self.loading_failed:
+                self.select_deficient_days()
+        elif not self.loading_failed:
+            # Page could be switched while loading was in progress
+            self.load_shown_month()
+
+    def repaint_dates(self):
+        for month in self.loaded_months:
+            first_day = QDate.fromString(f'{month}-01', Qt.ISODate)
+            for n in range(first_day.daysInMonth()):
+                self.paint_date(first_day.addDays(n).toString(Qt.ISODate))
+
+    def paint_date(self, date: str):
+        target_sec = get_main_window().params['target_hrs'] * 3600
+        logged_sec = self.logged_seconds.get(date, 0)
+        q_date = QDate.fromString(date, Qt.ISODate)
+        text_format = QTextCharFormat()
+        work_wdays = [IsoWeekdays[day] for day, enabled in get_main_window().params['work_days'].items() if enabled]
+
+        if q_date > QDate().currentDate() or (q_date.dayOfWeek() not in work_wdays and not logged_sec):
+            self.cal.setDateTextFormat(q_date, text_format)
+            return
+
+        if logged_sec >= target_sec:
+            text_format.setBackground(QColor('#c4df9b'))  # green
+        elif logged_sec:
+            text_format.setBackground(QColor('#fff79a'))  # yellow
+        else:
+            text_format.setBackground(QColor('#f4a6a6'))  # red
+
+        if date in self.parent.selected_dates:
+            text_format.setFontWeight(QFont.Bold)
+            text_format.setFontUnderline(True)
+
+        text_format.setToolTip(f'{logged_sec / 3600} hour(s) logged')
+        self.cal.setDateTextFormat(q_date, text_format)
+
+    def select_deficient_days(self):
+        """Narrow run to working days of selected range that have less than target hours logged"""
+        main_window = get_main_window()
+        main_window.read_params()
+        params = main_window.params
+
+        if self.load_range(params['from_date'], params['to_date']):
+            self.select_after_load = True
+            return
+
+        work_dates = get_work_dates(params['from_date'], params['to_date'], params['work_days'])
+        if [date for date in work_dates if date[:7] not in self.loaded_months]:
+            return
+
+        target_sec = params['target_hrs'] * 3600
+        self.parent.selected_dates = [date for date in work_dates if self.logged_seconds.get(date, 0) < target_sec]
+        self.parent.only_selected_dates = True
+
+        if self.parent.selected_dates:
+            self.status_lbl.setText(f'{len(self.parent.selected_dates)} deficient day(s) selected')
+        else:
+            self.status_lbl.setText('No deficient days in selected range')
+
+        self.repaint_dates()
+        main_window.update_start_button()
+
 
 class DaysConfigurator(QGroupBox):
     def __init__(self, parent):
@@ -341,6 +670,18 @@ class DaysConfigurator(QGroupBox):
         self.daily_only.setToolTip('If checked only Daily Tasks will be processed and logged\n'
                                    'Still they won\'t exceed target hours per day')
 
+        # Run worker in separate process control
+        self.run_in_process = QCheckBox()
+        self.run_in_process.setChecked(get_main_window().params['run_in_process'])
+        self.run_in_process.setToolTip('If checked logging runs in a separate process, which keeps window\n'
+                                       'responsive and allows to stop it immediately')
+
+        # Ignore estimate limits control
+        self.ignore_estimate_limits = QCheckBox()
+        self.ignore_estimate_limits.setChecked(get_main_window().params['ignore_estimate_limits'])
+        self.ignore_estimate_limits.setToolTip('If checked runs exceeding estimate limits from config\n'
+                                               'are started anyway with a warning')
+
         # Target hours per day
         self.target_hrs = QDoubleSpinBox()
         self.target_hrs.setSingleStep(0.1)
@@ -350,6 +691,7 @@ class DaysConfigurator(QGroupBox):
         self.target_hrs.setFixedWidth(50)
         self.target_hrs.setRange(1, 24)
         self.target_hrs.setValue(8)
+        self.target_hrs.valueChanged.connect(self.drop_dates_selection)
 
         # Daily tasks
         tasks_frame = QFrame(self, Qt.Widget)
@@ -383,6 +725,8 @@ class DaysConfigurator(QGroupBox):
         tasks_layout.addRow('Comment', self.tasks_comment)
         tasks_layout.addRow('Ignore tasks', self.ignore_tasks)
         misc_layout.addRow('Process Daily Tasks only', self.daily_only)
+        misc_layout.addRow('Run in separate process', self.run_in_process)
+        misc_layout.addRow('Ignore estimate limits', self.ignore_estimate_limits)
         misc_layout.addRow('Target working hours per day:', self.target_hrs)
 
         # Placing sub-widgets to root layout
@@ -394,6 +738,17 @@ class DaysConfigurator(QGroupBox):
         for switch in self.weekday_switches:
             self.weekdays[switch.text()] = switch.isChecked()
 
+        self.drop_dates_selection()
+
+    def drop_dates_selection(self):
+        """Deficient days depend on work days and target hours, so their selection is dropped once these change"""
+        date_widget = get_main_window().findChild(QWidget, 'dates_selector', Qt.FindChildrenRecursively)
+
+        if date_widget:
+            get_main_window().read_params()
+            date_widget.clear_selection()
+            get_main_window().update_start_button()
+
     def validate_input(self, *args, **kwargs):
         sender = self.sender()
         if not sender.text():
@@ -419,11 +774,42 @@ class MainButtons(QWidget):
         layout.setSpacing(3)
         layout.setContentsMargins(0, 5, 0, 0)
 
+        self.estimate_lbl = QLabel(self)
+        self.estimate_lbl.setWordWrap(True)
+
+        self.estimate_btn = QPushButton('Estimate')
+        self.estimate_btn.setFixedWidth(100)
+        self.estimate_btn.setToolTip('Estimate API calls and time the run would take')
+        self.estimate_btn.clicked.connect(get_main_window().execute_estimate)
+
         self.start_btn = QPushButton('Start')
         self.start_btn.setFixedWidth(100)
         self.start_btn.clicked.connect(get_main_window().execute_autologging)
 
+        self.stop_btn = QPushButton('Stop')
+        self.stop_btn.setFixedWidth(100)
+        self.stop_btn.setDisabled(True)
+        self.stop_btn.clicked.connect(get_main_window().cancel_autologging)
+
+        layout.addWidget(self.estimate_lbl, 1)
+        layout.addWidget(self.estimate_btn, 0, Qt.AlignHCenter)
         layout.addWidget(self.start_btn, 0, Qt.AlignHCenter)
+        layout.addWidget(self.stop_btn, 0, Qt.AlignHCenter)
+
+    def clear_estimate(self):
+        self.estimate_lbl.setText('Estimating...')
+        self.estimate_lbl.setStyleSheet('')
+
+    def show_estimate(self, estimate: str):
+        self.estimate_lbl.setText(estimate)
+
+    def show_estimate_warn(self, warn: str):
+        self.estimate_lbl.setText(f'{self.estimate_lbl.text()}\n{warn}')
+        self.estimate_lbl.setStyleSheet('QLabel { color: rgb(255, 140, 0) }')
+
+    def show_estimate_err(self, err: str):
+        self.estimate_lbl.setText(f'{self.estimate_lbl.text()}\n{err}')
+        self.estimate_lbl.setStyleSheet('QLabel { color: rgb(178, 34, 34) }')
 
 
 def get_main_window():
@@ -433,6 +819,11 @@ def get_main_window():
     return main
 
 
+def get_months(from_date: str, to_date: str) -> set:
+    """Get 'YYYY-MM' months overlapping given dates range"""
+    return set(date[:7] for date in get_work_dates(from_date, to_date, {day: True for day in WEEKDAYS}))
+
+
 def tasks_string_to_dict(tasks_string: str):
     """Convert input string like 'BR-3452:5 BR-226:8' to common dict"""
     try:
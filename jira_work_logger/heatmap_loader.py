@@ -0,0 +1,49 @@
+from collections import defaultdict
+
+from PyQt5.QtCore import pyqtSignal, QObject
+
+from jira_work_logger.backends import create_backend, BackendError
+
+
+class HeatmapLoader(QObject):
+    day_loaded = pyqtSignal(str, int)
+    err = pyqtSignal(str)
+    finished = pyqtSignal()
+
+    def __init__(self, params, from_date: str, to_date: str):
+        super().__init__()
+        self.settings = params
+        self.from_date = from_date
+        self.to_date = to_date
+        self.backend = None
+
+    def establish_connection(self):
+        try:
+            backend = create_backend(self.settings)
+            backend.connect()
+            return backend
+        except BackendError as exn:
+            self.err.emit(f'Heatmap could not connect to worklog backend! {str(exn)}')
+            return None
+
+    def load_logged_seconds(self):
+        """Load logged seconds per date for the whole range at once.
+        Totals are emitted as worklogs arrive so GUI could render them without waiting for the whole range"""
+        self.backend = self.establish_connection()
+
+        if not self.backend:
+            self.finished.emit()
+            return
+
+        try:
+            seconds_per_date = defaultdict(int)
+
+            for wlog in self.backend.load_worklogs(self.from_date, self.to_date):
+                seconds_per_date[wlog.date] += wlog.seconds
+                self.day_loaded.emit(wlog.date, seconds_per_date[wlog.date])
+        except Exception as exn:
+            self.err.emit(f'Heatmap could not load logged hours! {str(exn)}')
+        finally:
+            self.backend.close()
+
+        self.finished.emit()
@@ -1,21 +1,27 @@
+import time
 from datetime import datetime, timedelta
 from typing import Union, Iterable
 
 from PyQt5.QtCore import pyqtSignal, QObject
-from jira import JIRA, JIRAError
 
+from jira_work_logger.backends import BackendError, Worklog, create_backend
 from jira_work_logger.constants import *
+from jira_work_logger.estimator import estimate_run, record_run_stats
 
 
 class LogWorker(QObject):
     msg = pyqtSignal(str)
     warn = pyqtSignal(str)
     err = pyqtSignal(str)
+    estimated = pyqtSignal(str)
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal()
 
     def __init__(self, params):
         super().__init__()
         self.settings = params
-        self.conn = None
+        self.backend = None
+        self.estimate = None
         self._loaded_tasks = None
         self._loaded_worklogs = None
         self._work_dates = None
@@ -36,70 +42,29 @@ class LogWorker(QObject):
 
     def establish_connection(self):
         try:
-            self.msg.emit('Establishing connection to JIRA server...')
-            conn = JIRA(server=self.settings['jira_host'], validate=True, max_retries=0,
-                        basic_auth=(self.settings['jira_user'], self.settings['jira_pass']))
+            self.msg.emit(f'Establishing connection to {self.settings["backend"]} worklog backend...')
+            backend = create_backend(self.settings)
+            backend.connect()
             self.msg.emit('Connection established successfully')
-            return conn
-        except JIRAError as exn:
-            self.err.emit(f'Connection to JIRA server could not be established! JiraError HTTP {exn.status_code}')
-            return None
-        except Exception as exn:
-            self.err.emit(f'Connection to JIRA server could not be established! {str(exn)}')
+            return backend
+        except BackendError as exn:
+            self.err.emit(f'Connection to worklog backend could not be established! {str(exn)}')
             return None
 
     def load_tasks(self, status: Union[str, Iterable] = '', date: Union[str, Iterable] = ''):
-        status_filter = f' AND Status was "{status}"' if isinstance(status, str) else f' AND Status was IN {status}'
-        date_filter = f' ON "{date}"' if isinstance(date, str) else f' DURING ("{date[0]}","{date[1]}")'
-        user_filter = self.compose_user_filter()
-        ignored_list = ', '.join(self.settings['ignore_tasks']) if self.settings['ignore_tasks'] else []
-        ignored_filter = f' AND NOT issue in ({ignored_list})' if ignored_list else ''
-        query = f'{user_filter}{status_filter}{date_filter}{ignored_filter}'
-        tasks = self.conn.search_issues(jql_str=query, maxResults=1000)
-        return tasks
-
-    def compose_user_filter(self):
-        assignee = 'assignee=currentUser()' if self.settings['tasks_filter']['user_assignee'] else ''
-        validator = 'validator=currentUser()' if self.settings['tasks_filter']['user_validator'] else ''
-        creator = 'creator=currentUser()' if self.settings['tasks_filter']['user_creator'] else ''
-
-        user_filter = f'{assignee}' if assignee else f''
-        if validator:
-            user_filter = f'{validator}' if not assignee else f'({assignee} OR {validator})'
-        if creator:
-            user_filter = f'{creator}' if (not assignee and not validator) else f'({user_filter} OR {creator})'
-
-        return user_filter
+        return self.backend.find_tasks(status, date)
 
     def calculate_logged_seconds_for_date(self, date: str):
         """Calculate already logged time in seconds by user for given date"""
-        seconds_logged = 0
-        query = f'worklogAuthor = currentUser() AND worklogDate = {date}'
-        logged_tasks = self.conn.search_issues(query)
-        user_worklogs = []
-
-        for task in logged_tasks.iterable:
-            task_wlogs = [wlog for wlog in self.conn.worklogs(task.key) if wlog.started.split('T')[0] == date and
-                          wlog.author.name == self.settings['jira_user']]
-            user_worklogs.extend(task_wlogs)
-
-        for item in user_worklogs:
-            seconds_logged += item.timeSpentSeconds
-
-        return seconds_logged
+        return sum(wlog.seconds for wlog in self.backend.load_worklogs(date, date))
 
     def get_work_dates_for_period(self):
-        """Get work dates from given dates range using given work weekdays filter"""
-        start_date = datetime.strptime(self.settings['from_date'], '%Y-%m-%d').date()
-        end_date = datetime.strptime(self.settings['to_date'], '%Y-%m-%d').date()
-        work_wdays = [IsoWeekdays[day[0]] for day in list(self.settings['work_days'].items()) if day[1]]
-
-        work_dates = []
-        for n in range(int((end_date - start_date).days) + 1):
-            _date = start_date + timedelta(n)
+        """Get work dates from given dates range using given work weekdays filter.
+        If particular dates were selected (e.g. deficient days from heatmap) only they are kept"""
+        work_dates = get_work_dates(self.settings['from_date'], self.settings['to_date'], self.settings['work_days'])
 
-            if _date.isoweekday() in work_wdays:
-                work_dates.append(str(_date))
+        if self.settings['only_selected_dates']:
+            work_dates = [_date for _date in work_dates if _date in self.settings['selected_dates']]
 
         return work_dates
 
@@ -107,19 +72,55 @@ class LogWorker(QObject):
         self.msg.emit(f'Auto logging worker started for dates range from {self.settings["from_date"]} to '
                       f'{self.settings["to_date"]}')
 
-        # Establish connection to JIRA server
-        self.conn = self.establish_connection()
+        # Establish connection to worklog backend
+        self.backend = self.establish_connection()
 
-        if not self.conn:
-            self.thread().quit()
+        if not self.backend:
+            self.finished.emit()
             return
 
         # Defining whole list of work dates to be iterated through
         work_dates = self.get_work_dates_for_period()
         self.msg.emit(f'{len(work_dates)} working day(s) found')
 
-        # Processing date by date
-        for _date in work_dates:
+        # Refusing runs which are too expensive for the server
+        if not self.preflight(work_dates):
+            self.backend.close()
+            self.finished.emit()
+            return
+
+        # Pre-flight calls are excluded from stats, as neither run time nor model calls cover them
+        preflight_calls = self.backend.requests_sent
+        started_at = time.monotonic()
+
+        # Backend is closed in any case, so its cached data isn't lost if the run fails
+        try:
+            stopped = self.process_work_dates(work_dates)
+        except Exception as exn:
+            self.err.emit(f'Auto logging worker failed! {str(exn)}')
+            stopped = True
+        finally:
+            self.backend.close()
+
+        if not stopped:
+            record_run_stats(self.settings['backend'], self.backend.requests_sent - preflight_calls,
+                             time.monotonic() - started_at, self.estimate.model_calls if self.estimate else 0)
+            self.progress.emit(len(work_dates), len(work_dates))
+            self.msg.emit(f'Auto logging worker successfully finished')
+
+        self.finished.emit()
+
+    def process_work_dates(self, work_dates: list):
+        """Log work date by date. Returns whether processing was stopped by user"""
+        stopped = False
+        for processed, _date in enumerate(work_dates):
+            self.progress.emit(processed, len(work_dates))
+
+            if self.thread().isInterruptionRequested():
+                self.warn.emit(f'Auto logging worker has been stopped before processing date {_date}')
+                stopped = True
+                break
+
             self.msg.emit(f'Starting to process date {_date}')
             # TODO: Get rid of time hard code
             date = datetime.strptime(f'{_date}T06:00:40-0500', '%Y-%m-%dT%H:%M:%S%z')
@@ -142,8 +143,8 @@ class LogWorker(QObject):
 
             ranked_tasks = {
                 'high': list(self.settings['daily_tasks'].items()),
-                'medium': self.load_tasks(TASK_INPROGRESS_STATUS, _date).iterable,
-                'low': self.load_tasks(TASK_REVIEW_STATUS, _date).iterable
+                'medium': self.load_tasks(TASK_INPROGRESS_STATUS, _date),
+                'low': self.load_tasks(TASK_REVIEW_STATUS, _date)
             }
 
             # Removing occurrences of Med tasks in Low tasks if any
@@ -153,23 +154,24 @@ class LogWorker(QObject):
             if not self.settings['daily_only']:
                 self.msg.emit(f'Totally {overall_tasks_found} suitable task(s) found for this date')
 
+            # Worklogs are collected for the whole date first and then submitted to backend at once
+            worklogs = []
+
             # Beginning of work logging cycle within High priority tasks
             tasks_comment = self.settings['tasks_comment'] or ''
             while ranked_tasks['high'] and needed_sec:
                 task, time_str = ranked_tasks['high'].pop()
                 time_sec = str_to_sec(time_str)
                 if needed_sec - time_sec < 0:
-                    self.conn.add_worklog(task, timeSpentSeconds=time_sec - needed_sec, started=date,
-                                          comment=tasks_comment)
-                    self.msg.emit(f'Work logged for task {task} = {time_sec / 3600} hour(s)')
+                    worklogs.append(Worklog(task, date, time_sec - needed_sec, tasks_comment))
                     needed_sec = 0
                 else:
-                    self.conn.add_worklog(task, timeSpentSeconds=time_sec, started=date, comment=tasks_comment)
-                    self.msg.emit(f'Work logged for task {task} = {time_sec / 3600} hour(s)')
+                    worklogs.append(Worklog(task, date, time_sec, tasks_comment))
                     needed_sec -= time_sec
 
             # Process Daily Tasks Only option
             if self.settings['daily_only']:
+                self.submit_worklogs(_date, worklogs)
                 self.summarize_day_result(_date)
                 continue
 
@@ -179,35 +181,106 @@ class LogWorker(QObject):
                 time_per_low = ((needed_sec / 3600) % len(ranked_tasks['medium'])) * 3600
 
                 for task in ranked_tasks['medium']:
-                    self.conn.add_worklog(task.key, timeSpentSeconds=time_per_med, started=date)
-                    self.msg.emit(f'Work logged for task {task.key} = {time_per_med / 3600} hour(s)')
+                    worklogs.append(Worklog(task, date, time_per_med))
 
                 if time_per_low:
                     task = ranked_tasks['low'][0]
-                    self.conn.add_worklog(task.key, timeSpentSeconds=time_per_low, started=date)
-                    self.msg.emit(f'Work logged for task {task.key} = {time_per_low / 3600} hour(s)')
+                    worklogs.append(Worklog(task, date, time_per_low))
 
             elif ranked_tasks['medium'] and not ranked_tasks['low']:
                 time_per_med = ((needed_sec / 3600) / len(ranked_tasks['medium'])) * 3600
 
                 for task in ranked_tasks['medium']:
-                    self.conn.add_worklog(task.key, timeSpentSeconds=time_per_med, started=date)
-                    self.msg.emit(f'Work logged for task {task.key} = {time_per_med / 3600} hour(s)')
+                    worklogs.append(Worklog(task, date, time_per_med))
 
             elif not ranked_tasks['medium'] and ranked_tasks['low']:
                 time_per_low = ((needed_sec / 3600) / len(ranked_tasks['low'])) * 3600
 
                 for task in ranked_tasks['low']:
-                    self.conn.add_worklog(task.key, timeSpentSeconds=time_per_low, started=date)
-                    self.msg.emit(f'Work logged for task {task.key} = {time_per_low / 3600} hour(s)')
+                    worklogs.append(Worklog(task, date, time_per_low))
 
             elif not len(ranked_tasks['medium']) and not ranked_tasks['low']:
                 self.warn.emit(f'Not enough tasks for sufficient time logging in {_date}!')
 
+            self.submit_worklogs(_date, worklogs)
             self.summarize_day_result(_date)
 
-        self.msg.emit(f'Auto logging worker successfully finished')
-        self.thread().quit()
+        return stopped
+
+    def execute_estimate(self):
+        """Only estimate the run without logging anything"""
+        self.backend = self.establish_connection()
+
+        if self.backend:
+            try:
+                self.preflight(self.get_work_dates_for_period())
+            finally:
+                self.backend.close()
+
+        self.finished.emit()
+
+    def preflight(self, work_dates: list):
+        """Estimate cost of the run and report whether it's allowed by configured thresholds"""
+        try:
+            self.estimate = estimate_run(self.settings, self.backend, work_dates)
+        except Exception as exn:
+            self.warn.emit(f'Run could not be estimated! {str(exn)}')
+            return True
+
+        self.msg.emit(str(self.estimate))
+        self.estimated.emit(str(self.estimate))
+        warnings, errors = self.estimate.check_thresholds(self.settings)
+
+        for warning in warnings:
+            self.warn.emit(warning)
+
+        for error in errors:
+            self.err.emit(error)
+
+        return not errors
+
+    def submit_worklogs(self, date: str, worklogs: list):
+        """Merge planned worklogs into a single write per task. If marking worklogs is enabled, tasks which
+        already have a worklog created by logger on this date get that worklog topped up instead of another one"""
+        planned = {}
+        for wlog in worklogs:
+            if wlog.seconds <= 0:
+                continue
+
+            if wlog.issue in planned:
+                planned[wlog.issue].seconds += wlog.seconds
+            else:
+                comment = mark_comment(wlog.comment) if self.settings['mark_worklogs'] else wlog.comment
+                planned[wlog.issue] = Worklog(wlog.issue, wlog.started, wlog.seconds, comment)
+
+        if not planned:
+            return
+
+        auto_worklogs = {}
+        if self.settings['mark_worklogs']:
+            auto_worklogs = {wlog.issue: wlog for wlog in self.backend.load_worklogs(date, date)
+                             if WORKLOG_MARKER in wlog.comment}
+
+        new_worklogs, updated_worklogs = [], []
+        for issue, wlog in planned.items():
+            if issue in auto_worklogs:
+                existing = auto_worklogs[issue]
+                updated_worklogs.append(Worklog(issue, existing.started, existing.seconds + wlog.seconds,
+                                                existing.comment, existing.worklog_id))
+            else:
+                new_worklogs.append(wlog)
+
+        if new_worklogs:
+            self.backend.add_worklogs(new_worklogs)
+        if updated_worklogs:
+            self.backend.update_worklogs(updated_worklogs)
+
+        for wlog in new_worklogs:
+            self.msg.emit(f'Work logged for task {wlog.issue} = {wlog.seconds / 3600} hour(s)')
+
+        for wlog in updated_worklogs:
+            self.msg.emit(f'Work logged for task {wlog.issue} = {planned[wlog.issue].seconds / 3600} hour(s) '
+                          f'added to existing work log, {wlog.seconds / 3600} hour(s) in total')
 
     def summarize_day_result(self, date):
         summary_msg = f'Summary for {date}: Work log'
@@ -222,6 +295,27 @@ class LogWorker(QObject):
             self.warn.emit(f'{summary_msg} overloaded by {abs(diff_sec) / 3600} hour(s)!')
 
 
+def get_work_dates(from_date: str, to_date: str, work_days: dict):
+    """Get dates from given dates range which weekdays are enabled in work days dict"""
+    start_date = datetime.strptime(from_date, '%Y-%m-%d').date()
+    end_date = datetime.strptime(to_date, '%Y-%m-%d').date()
+    work_wdays = [IsoWeekdays[day[0]] for day in list(work_days.items()) if day[1]]
+
+    work_dates = []
+    for n in range(int((end_date - start_date).days) + 1):
+        _date = start_date + timedelta(n)
+
+        if _date.isoweekday() in work_wdays:
+            work_dates.append(str(_date))
+
+    return work_dates
+
+
+def mark_comment(comment: str) -> str:
+    """Add marker which lets logger recognize its own worklogs during next runs"""
+    return f'{comment} {WORKLOG_MARKER}' if comment else WORKLOG_MARKER
+
+
 def str_to_sec(time_str: str):
     if time_str[-1] in 'hms':
         return int(time_str[:-1]) * TimeToSec[time_str[-1]]
@@ -0,0 +1,81 @@
+import multiprocessing
+
+from PyQt5.QtCore import pyqtSignal, QObject, QTimer
+
+from jira_work_logger.constants import *
+from jira_work_logger.log_worker import LogWorker
+
+WORKER_EVENTS = ('msg', 'warn', 'err', 'progress')
+
+
+def run_worker_process(params, conn):
+    """Entry point of worker subprocess. Worker signals are streamed to parent process as (event, args) tuples"""
+    worker = LogWorker(params)
+
+    for event in WORKER_EVENTS:
+        getattr(worker, event).connect(lambda *args, _event=event: conn.send((_event, args)))
+
+    try:
+        worker.execute_logging()
+    except Exception as exn:
+        conn.send(('err', (f'Worker process failed! {str(exn)}',)))
+
+    conn.send(('finished', ()))
+    conn.close()
+
+
+class ProcessWorker(QObject):
+    """Runs LogWorker engine in a separate process, so neither network nor response decoding could affect GUI.
+    Unlike worker thread it can be cancelled immediately at any moment"""
+    msg = pyqtSignal(str)
+    warn = pyqtSignal(str)
+    err = pyqtSignal(str)
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal()
+
+    def __init__(self, params):
+        super().__init__()
+        self.settings = params
+        self.process = None
+        self.conn = None
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.read_events)
+
+    def start(self):
+        # Forking would copy running QApplication and threads into the child, so it's spawned on every platform
+        context = multiprocessing.get_context('spawn')
+        self.conn, child_conn = context.Pipe(duplex=False)
+        self.process = context.Process(target=run_worker_process, args=(dict(self.settings), child_conn), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.timer.start(PROCESS_POLL_INTERVAL)
+
+    def read_events(self):
+        try:
+            while self.conn.poll():
+                event, args = self.conn.recv()
+
+                if event == 'finished':
+                    self.stop()
+                    return
+
+                getattr(self, event).emit(*args)
+        except (EOFError, OSError):
+            self.err.emit('Worker process has been terminated unexpectedly!')
+            self.stop()
+
+    def cancel(self):
+        if self.process and self.process.is_alive():
+            self.process.terminate()
+            self.warn.emit('Worker process has been cancelled')
+
+        self.stop()
+
+    def stop(self):
+        if not self.timer.isActive():
+            return
+
+        self.timer.stop()
+        self.conn.close()
+        self.process.join()
+        self.finished.emit()
@@ -0,0 +1,61 @@
+import threading
+from typing import Callable, Iterable
+
+
+class RequestMemo:
+    """In-run memoization of read requests.
+    Concurrent callers asking for the same key share a single in-flight request instead of sending their own.
+    Entries are tagged (e.g. by issue or date), so writes could invalidate everything they affect"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results = {}
+        self._tags = {}
+        self._in_flight = {}
+        self._stale = set()
+
+    def get(self, key: str, loader: Callable, tags: Iterable[str] = ()):
+        while True:
+            with self._lock:
+                if key in self._results:
+                    return self._results[key]
+
+                event = self._in_flight.get(key)
+                if not event:
+                    event = self._in_flight[key] = threading.Event()
+                    self._tags[key] = set(tags)
+                    break
+
+            # Somebody else is already loading this key, so just wait for the result.
+            # If the request failed or was invalidated meanwhile the loop starts over
+            event.wait()
+
+        try:
+            result = loader()
+
+            with self._lock:
+                if key not in self._stale:
+                    self._results[key] = result
+            return result
+        finally:
+            with self._lock:
+                self._stale.discard(key)
+                if key not in self._results:
+                    self._tags.pop(key, None)
+                del self._in_flight[key]
+            event.set()
+
+    def invalidate(self, *tags: str):
+        """Drop cached results having any of given tags. Results being loaded right now won't be cached"""
+        with self._lock:
+            for key, key_tags in list(self._tags.items()):
+                if key_tags.intersection(tags):
+                    if key in self._in_flight:
+                        self._stale.add(key)
+                    else:
+                        del self._tags[key]
+                        self._results.pop(key, None)
+
+
+def normalize_jql(jql: str) -> str:
+    return ' '.join(jql.split())
@@ -0,0 +1,50 @@
+import json
+from pathlib import Path
+
+CACHE_VERSION = 2
+
+
+class ResourceCache:
+    """Local storage of server resources along with their validators (ETag, Last-Modified, issue 'updated' etc.)
+    Entries are kept per namespace (server and user), so different accounts never share cached data.
+    Least recently used entries are evicted once namespace exceeds max_entries"""
+
+    def __init__(self, path: str, namespace: str, max_entries: int):
+        self.path = Path(path)
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self._storage = self.load()
+
+    @property
+    def entries(self) -> dict:
+        return self._storage.setdefault(self.namespace, {})
+
+    def load(self) -> dict:
+        try:
+            storage = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return {'version': CACHE_VERSION}
+
+        # Data cached by other app version may have different layout, so it's dropped
+        return storage if storage.get('version') == CACHE_VERSION else {'version': CACHE_VERSION}
+
+    def save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(self._storage))
+        except OSError:
+            pass
+
+    def get(self, resource: str):
+        entry = self.entries.pop(resource, None)
+
+        if entry:
+            self.entries[resource] = entry
+        return entry
+
+    def put(self, resource: str, data, validators: dict):
+        self.entries.pop(resource, None)
+        self.entries[resource] = {'validators': validators, 'data': data}
+
+        while len(self.entries) > self.max_entries:
+            del self.entries[next(iter(self.entries))]
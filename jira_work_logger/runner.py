@@ -1,3 +1,4 @@
+import multiprocessing
 import sys
 
 from PyQt5.QtWidgets import QApplication
@@ -5,6 +6,7 @@ from PyQt5.QtWidgets import QApplication
 from jira_work_logger.gui.widgets import MainWindow
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     root = MainWindow()
     root.show()